@@ -2,15 +2,16 @@
 Video Merge API – accepts 2–10 video URLs, merges with quality/aspect ratio, returns merged video URL.
 Also supports longform video rendering with async processing.
 """
+import asyncio
 import logging
 import re
-import tempfile
+import shutil
 import time
 import uuid
 from pathlib import Path
-from typing import List
+from typing import Iterable, List
 
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator
@@ -23,36 +24,52 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 from utils.auth import get_api_key
+from utils.download import download_files
 from utils.storage import upload_merged_video
+from utils.tempdir import make_temp_dir
 from utils.video_processor import (
     MAX_DURATION_SECONDS,
-    download_video,
-    get_duration_and_has_audio,
-    merge_videos,
+    RESOLUTION_KEYS,
+    merge_videos_async,
+    probe_all,
 )
-from utils.db import init_db
+from utils.db import close_db, init_db
+from utils.http_client import close_http_client
 from utils.worker import start_worker_background
 from routers.longform import router as longform_router
 
+_URL_RE = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
+
+
+def _choice_pattern(values: Iterable[str]) -> str:
+    """Anchored regex matching exactly one of the given strings."""
+    return "^(" + "|".join(re.escape(v) for v in sorted(values)) + ")$"
+
+
+# Field patterns come from the supported resolutions, so they cannot drift from DIMENSIONS.
+# DIMENSIONS covers every quality x aspect ratio pair, so checking each field suffices.
+_QUALITY_PATTERN = _choice_pattern({q for q, _ in RESOLUTION_KEYS})
+_ASPECT_RATIO_PATTERN = _choice_pattern({a for _, a in RESOLUTION_KEYS})
+
 # --- Request / Response models ---
 
 
 class MergeRequest(BaseModel):
     video_urls: List[str] = Field(...)
-    quality: str = Field(default="1080", pattern="^(720|1080)$")
-    aspect_ratio: str = Field(default="16:9", pattern="^(9:16|16:9|1:1)$")
+    quality: str = Field(default="1080", pattern=_QUALITY_PATTERN)
+    aspect_ratio: str = Field(default="16:9", pattern=_ASPECT_RATIO_PATTERN)
+    transitions: bool = Field(default=True)
 
     @field_validator("video_urls")
     @classmethod
     def validate_urls(cls, v: List[str]) -> List[str]:
         if not v or len(v) < 2 or len(v) > 10:
             raise ValueError("Provide between 2 and 10 video URLs")
-        url_re = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
-        for i, u in enumerate(v):
-            u = (u or "").strip()
-            if not u or not url_re.match(u):
+        stripped = [(u or "").strip() for u in v]
+        for u in stripped:
+            if not _URL_RE.match(u):
                 raise ValueError(f"Invalid URL: {u!r}")
-        return [u.strip() for u in v]
+        return stripped
 
 
 class MergeSuccessResponse(BaseModel):
@@ -69,43 +86,42 @@ router = APIRouter(prefix="/api/v1", tags=["merge"])
 
 
 @router.post("/merge", response_model=MergeSuccessResponse)
-def merge(
+async def merge(
     body: MergeRequest,
+    background_tasks: BackgroundTasks,
     _api_key: str = Depends(get_api_key),
 ) -> MergeSuccessResponse:
     """
     Merge 2–10 video URLs into one video with configurable quality and aspect ratio.
     Total duration must not exceed 2 hours. Returns URL to the merged video.
+    Downloads, probes and FFmpeg run as async I/O and subprocesses; only the storage
+    upload runs in a worker thread, so the event loop stays responsive.
     """
     start = time.perf_counter()
-    temp_dir = Path(tempfile.mkdtemp())
+    temp_dir = make_temp_dir()
     try:
-        # 1) Download each video
-        paths: List[Path] = []
-        for i, url in enumerate(body.video_urls):
-            dest = temp_dir / f"clip_{i}.mp4"
-            try:
-                download_video(url, dest)
-            except Exception as e:
+        # 1) Download all videos concurrently
+        paths: List[Path] = [temp_dir / f"clip_{i}.mp4" for i in range(len(body.video_urls))]
+        errors = await download_files(body.video_urls, paths)
+        for url, err in zip(body.video_urls, errors):
+            if err is not None:
                 raise HTTPException(
                     status_code=422,
                     detail=f"Failed to download video from URL: {url[:80]}...",
-                ) from e
-            paths.append(dest)
-
-        # 2) Probe duration and audio for each
-        durations: List[float] = []
-        has_audio_list: List[bool] = []
-        for i, p in enumerate(paths):
-            try:
-                dur, has_audio = get_duration_and_has_audio(p)
-                durations.append(dur)
-                has_audio_list.append(has_audio)
-            except ValueError as e:
+                ) from err
+
+        # 2) Probe duration and audio for each, concurrently
+        probes = await probe_all(paths)
+        for i, res in enumerate(probes):
+            if isinstance(res, ValueError):
                 raise HTTPException(
                     status_code=400,
                     detail=f"Video at index {i} is not a supported format",
-                ) from e
+                ) from res
+            if isinstance(res, BaseException):
+                raise res
+        durations: List[float] = [info.duration for info in probes]
+        has_audio_list: List[bool] = [info.has_audio for info in probes]
 
         total_duration = sum(durations)
         if total_duration > MAX_DURATION_SECONDS:
@@ -117,13 +133,15 @@ def merge(
         # 3) Merge with FFmpeg
         out_path = temp_dir / "merged.mp4"
         try:
-            output_duration = merge_videos(
+            output_duration = await merge_videos_async(
                 paths,
                 body.quality,
                 body.aspect_ratio,
                 out_path,
                 durations,
                 has_audio_list,
+                transitions=body.transitions,
+                infos=probes,
             )
         except (RuntimeError, ValueError) as e:
             logger.exception("FFmpeg merge failed")
@@ -131,7 +149,9 @@ def merge(
 
         # 4) Upload to Railway bucket
         try:
-            merged_url = upload_merged_video(out_path, key_prefix=f"merged-{uuid.uuid4().hex[:12]}")
+            merged_url = await asyncio.to_thread(
+                upload_merged_video, out_path, key_prefix=f"merged-{uuid.uuid4().hex[:12]}"
+            )
         except Exception as e:
             logger.exception("Upload failed: %s", e)
             raise HTTPException(
@@ -140,6 +160,8 @@ def merge(
             ) from e
 
         elapsed = time.perf_counter() - start
+        # 5) Cleanup temp files after the response is sent
+        background_tasks.add_task(shutil.rmtree, temp_dir, ignore_errors=True)
         return MergeSuccessResponse(
             merged_url=merged_url,
             duration_seconds=round(output_duration, 2),
@@ -147,24 +169,15 @@ def merge(
             clips_merged=len(paths),
         )
     except HTTPException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
         raise
     except Exception as e:
         logger.exception("Merge request failed")
+        shutil.rmtree(temp_dir, ignore_errors=True)
         raise HTTPException(
             status_code=500,
             detail=f"Video processing failed: {str(e)}",
         ) from e
-    finally:
-        # 5) Cleanup temp files
-        for f in (temp_dir.iterdir() if temp_dir.exists() else []):
-            try:
-                f.unlink()
-            except OSError:
-                pass
-        try:
-            temp_dir.rmdir()
-        except OSError:
-            pass
 
 
 # --- App ---
@@ -189,6 +202,13 @@ async def startup_event():
     logger.info("Background worker started")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the shared HTTP client and database connection."""
+    await close_http_client()
+    await close_db()
+
+
 @app.exception_handler(HTTPException)
 def http_exception_handler(_request: Request, exc: HTTPException) -> JSONResponse:
     """Return errors as { \"error\": \"...\" } per API spec."""
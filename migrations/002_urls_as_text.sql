@@ -0,0 +1,11 @@
+-- Migration 002: Store URL lists as newline-separated TEXT instead of JSON arrays
+-- Columns stay TEXT; rows written as JSON by earlier versions are re-encoded.
+-- Safe to re-run: newline-separated values start with the URL scheme, never '['.
+
+UPDATE jobs
+SET audio_urls = COALESCE((SELECT group_concat(value, char(10)) FROM json_each(jobs.audio_urls)), '')
+WHERE audio_urls LIKE '[%' AND json_valid(audio_urls);
+
+UPDATE jobs
+SET background_urls = COALESCE((SELECT group_concat(value, char(10)) FROM json_each(jobs.background_urls)), '')
+WHERE background_urls LIKE '[%' AND json_valid(background_urls);
@@ -14,6 +14,8 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/longform", tags=["longform"])
 
+_URL_RE = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
+
 
 # --- Request / Response models ---
 
@@ -30,12 +32,11 @@ class LongformRenderRequest(BaseModel):
         if not v or len(v) < 1 or len(v) > 30:
             raise ValueError("Provide between 1 and 30 audio URLs")
         
-        url_re = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
-        for i, u in enumerate(v):
-            u = (u or "").strip()
-            if not u or not url_re.match(u):
+        stripped = [(u or "").strip() for u in v]
+        for i, u in enumerate(stripped):
+            if not _URL_RE.match(u):
                 raise ValueError(f"Invalid audio URL at index {i}: {u!r}")
-        return [u.strip() for u in v]
+        return stripped
 
     @field_validator("background_urls")
     @classmethod
@@ -51,13 +52,12 @@ class LongformRenderRequest(BaseModel):
             if len(v) < 1 or len(v) > 5:
                 raise ValueError("For videos: provide between 1 and 5 URLs")
         
-        url_re = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
-        for i, u in enumerate(v):
-            u = (u or "").strip()
-            if not u or not url_re.match(u):
+        stripped = [(u or "").strip() for u in v]
+        for i, u in enumerate(stripped):
+            if not _URL_RE.match(u):
                 raise ValueError(f"Invalid background URL at index {i}: {u!r}")
         
-        return [u.strip() for u in v]
+        return stripped
 
 
 class LongformRenderResponse(BaseModel):
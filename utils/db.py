@@ -1,26 +1,89 @@
 """SQLite database utilities for async job tracking."""
-import json
+import asyncio
 import os
+import time
 import aiosqlite
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 DB_PATH = os.getenv("DATABASE_PATH", "jobs.db")
+JOB_CACHE_TTL = 0.5  # seconds a polled job row is served from memory
+
+# Single long-lived connection, opened by init_db()
+_conn: Optional[aiosqlite.Connection] = None
+# Serializes write transactions on the shared connection
+_write_lock = asyncio.Lock()
+# job_id -> (fetched_at, job)
+_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+# Set by create_job so the worker wakes immediately instead of on its next poll
+_new_job = asyncio.Event()
+
+
+def _join_urls(urls: List[str]) -> str:
+    """Encode a URL list for storage (validated URLs never contain newlines)."""
+    return "\n".join(urls)
+
+
+def _split_urls(value: str) -> List[str]:
+    """Decode a stored URL list."""
+    return value.split("\n") if value else []
+
+
+def _row_to_job(row: aiosqlite.Row) -> Dict[str, Any]:
+    """Convert a jobs row to a dict with URL lists decoded."""
+    job = dict(row)
+    job["audio_urls"] = _split_urls(job["audio_urls"])
+    job["background_urls"] = _split_urls(job["background_urls"])
+    return job
+
+
+def _prune_cache(now: float) -> None:
+    """Drop expired entries, so jobs polled after their last update do not pile up."""
+    expired = [job_id for job_id, (fetched_at, _) in _cache.items() if now - fetched_at >= JOB_CACHE_TTL]
+    for job_id in expired:
+        del _cache[job_id]
+
+
+def _get_conn() -> aiosqlite.Connection:
+    """Return the shared connection. Raises if init_db() has not run."""
+    if _conn is None:
+        raise RuntimeError("Database not initialized; call init_db() first")
+    return _conn
 
 
 async def init_db():
-    """Initialize database and run migrations."""
+    """Open the shared connection and run migrations."""
+    global _conn
     db_path = Path(DB_PATH)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Run migration
-        migration_file = Path(__file__).parent.parent / "migrations" / "001_initial_schema.sql"
-        if migration_file.exists():
-            with open(migration_file, "r") as f:
-                await db.executescript(f.read())
-        await db.commit()
+
+    if _conn is None:
+        _conn = await aiosqlite.connect(DB_PATH)
+        _conn.row_factory = aiosqlite.Row
+        # WAL with NORMAL sync: commits append to the log without an fsync each
+        await _conn.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA busy_timeout=5000;"
+            "PRAGMA temp_store=MEMORY;"
+        )
+
+    # Run migrations in order (each is idempotent)
+    migrations_dir = Path(__file__).parent.parent / "migrations"
+    for migration_file in sorted(migrations_dir.glob("*.sql")):
+        with open(migration_file, "r") as f:
+            await _conn.executescript(f.read())
+    await _conn.commit()
+
+
+async def close_db():
+    """Close the shared connection."""
+    global _conn
+    if _conn is not None:
+        await _conn.close()
+        _conn = None
+    _cache.clear()
 
 
 async def create_job(
@@ -31,7 +94,8 @@ async def create_job(
     quality: str,
 ) -> None:
     """Create a new job with pending status."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = _get_conn()
+    async with _write_lock:
         now = datetime.utcnow().isoformat()
         await db.execute(
             """
@@ -43,40 +107,47 @@ async def create_job(
                 "pending",
                 now,
                 now,
-                json.dumps(audio_urls),
+                _join_urls(audio_urls),
                 background_source,
-                json.dumps(background_urls),
+                _join_urls(background_urls),
                 quality,
             ),
         )
         await db.commit()
+    _new_job.set()
 
 
 async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
     """Retrieve a job by ID. Returns None if not found."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)) as cursor:
-            row = await cursor.fetchone()
-            if row is None:
-                return None
-            
-            job = dict(row)
-            # Parse JSON fields
-            job["audio_urls"] = json.loads(job["audio_urls"])
-            job["background_urls"] = json.loads(job["background_urls"])
-            return job
+    now = time.monotonic()
+    cached = _cache.get(job_id)
+    if cached is not None:
+        if now - cached[0] < JOB_CACHE_TTL:
+            return cached[1]
+        del _cache[job_id]
+
+    async with _get_conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)) as cursor:
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+
+        job = _row_to_job(row)
+        _prune_cache(now)
+        _cache[job_id] = (now, job)
+        return job
 
 
 async def update_job_status(job_id: str, status: str, error_message: Optional[str] = None) -> None:
     """Update job status and optionally set error message."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = _get_conn()
+    async with _write_lock:
         now = datetime.utcnow().isoformat()
         await db.execute(
             "UPDATE jobs SET status = ?, updated_at = ?, error_message = ? WHERE id = ?",
             (status, now, error_message, job_id),
         )
         await db.commit()
+    _cache.pop(job_id, None)
 
 
 async def update_job_result(
@@ -86,32 +157,66 @@ async def update_job_result(
     processing_time: float,
 ) -> None:
     """Mark job as completed and store result."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = _get_conn()
+    async with _write_lock:
         now = datetime.utcnow().isoformat()
         await db.execute(
             """
-            UPDATE jobs 
+            UPDATE jobs
             SET status = ?, updated_at = ?, result_url = ?, duration_seconds = ?, processing_time = ?
             WHERE id = ?
             """,
             ("completed", now, result_url, duration_seconds, processing_time, job_id),
         )
         await db.commit()
+    _cache.pop(job_id, None)
 
 
 async def get_pending_jobs(limit: int = 10) -> List[Dict[str, Any]]:
-    """Get pending jobs for processing."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM jobs WHERE status = 'pending' ORDER BY created_at ASC LIMIT ?",
-            (limit,),
-        ) as cursor:
-            rows = await cursor.fetchall()
-            jobs = []
-            for row in rows:
-                job = dict(row)
-                job["audio_urls"] = json.loads(job["audio_urls"])
-                job["background_urls"] = json.loads(job["background_urls"])
-                jobs.append(job)
-            return jobs
+    """
+    Claim pending jobs for processing.
+    Selected jobs are marked 'processing' in the same transaction, so a job is never
+    handed out twice.
+    """
+    db = _get_conn()
+    async with _write_lock:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            async with db.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' ORDER BY created_at ASC LIMIT ?",
+                (limit,),
+            ) as cursor:
+                rows = await cursor.fetchall()
+            jobs = [_row_to_job(row) for row in rows]
+
+            if jobs:
+                now = datetime.utcnow().isoformat()
+                ids = [job["id"] for job in jobs]
+                placeholders = ",".join("?" * len(ids))
+                await db.execute(
+                    f"UPDATE jobs SET status = 'processing', updated_at = ? WHERE id IN ({placeholders})",
+                    (now, *ids),
+                )
+                for job in jobs:
+                    job["status"] = "processing"
+                    job["updated_at"] = now
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+    for job in jobs:
+        _cache.pop(job["id"], None)
+    return jobs
+
+
+async def wait_for_new_job(timeout: float) -> None:
+    """
+    Wait until create_job signals a new job, or at most `timeout` seconds (a failsafe
+    for jobs inserted by another process). Clears the signal before returning.
+    """
+    try:
+        await asyncio.wait_for(_new_job.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    _new_job.clear()
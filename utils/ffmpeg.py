@@ -0,0 +1,86 @@
+"""Run FFmpeg keeping only the tail of its log (long encodes can write megabytes of stderr)."""
+import asyncio
+import os
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+from typing import List
+
+# Passed as -loglevel; set FFMPEG_LOGLEVEL=info (or debug) when diagnosing a job
+FFMPEG_LOGLEVEL = os.getenv("FFMPEG_LOGLEVEL", "error")
+STDERR_TAIL_LINES = 200
+
+
+def _with_loglevel(cmd: List[str]) -> List[str]:
+    """
+    Insert -hide_banner -nostats -loglevel right after the ffmpeg executable. -nostats
+    also matters for reading: progress updates end in \r, so they never complete a line.
+    """
+    return [cmd[0], "-hide_banner", "-nostats", "-loglevel", FFMPEG_LOGLEVEL, *cmd[1:]]
+
+
+def write_concat_list(list_file: Path, paths: List[Path]) -> None:
+    """Write a concat demuxer playlist of the given files."""
+    with open(list_file, "w") as f:
+        for p in paths:
+            f.write(f"file '{p.absolute()}'\n")
+
+
+def _tail_text(tail: deque) -> str:
+    return b"".join(tail).decode("utf-8", "replace")
+
+
+def run_ffmpeg(cmd: List[str], timeout: float, error_prefix: str) -> None:
+    """
+    Run an FFmpeg command, reading stderr as it is written and keeping only the last
+    STDERR_TAIL_LINES lines. Raises RuntimeError with that tail on failure and
+    subprocess.TimeoutExpired if it runs longer than timeout seconds.
+    """
+    tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+    expired = threading.Event()
+    with subprocess.Popen(
+        _with_loglevel(cmd), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    ) as proc:
+
+        def kill() -> None:
+            expired.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        try:
+            for line in proc.stderr:
+                tail.append(line)
+            returncode = proc.wait()
+        finally:
+            timer.cancel()
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout, stderr=_tail_text(tail))
+    if returncode != 0:
+        raise RuntimeError(f"{error_prefix}: {_tail_text(tail)}")
+
+
+async def run_ffmpeg_async(cmd: List[str], timeout: float, error_prefix: str) -> None:
+    """Like run_ffmpeg, as an asyncio subprocess (does not block the event loop)."""
+    tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+    proc = await asyncio.create_subprocess_exec(
+        *_with_loglevel(cmd),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def drain() -> int:
+        async for line in proc.stderr:
+            tail.append(line)
+        return await proc.wait()
+
+    try:
+        returncode = await asyncio.wait_for(drain(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout, stderr=_tail_text(tail))
+    if returncode != 0:
+        raise RuntimeError(f"{error_prefix}: {_tail_text(tail)}")
@@ -0,0 +1,28 @@
+"""Shared async HTTP client for media downloads (connection pool reused across jobs)."""
+from typing import Optional
+
+import httpx
+
+DOWNLOAD_TIMEOUT = 300  # 5 min per file
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=DOWNLOAD_TIMEOUT,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,22 +1,87 @@
 """Longform video processor - creates videos from audio + background images/videos."""
+import asyncio
+import logging
+import os
 import subprocess
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List, Tuple
-import httpx
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from utils.download import download_files
+from utils.ffmpeg import run_ffmpeg, write_concat_list
+from utils.video_processor import fit_filter, nvenc_available
+
+logger = logging.getLogger(__name__)
 
 MAX_LONGFORM_DURATION_SECONDS = 7200  # 2 hours
-DOWNLOAD_TIMEOUT = 300  # 5 min per file
+PROBE_CONCURRENCY = 8  # parallel ffprobe processes
+
+# Encode on the GPU (NVENC) with CUDA decode/scale instead of libx264 on the CPU.
+# Only honored when nvenc_available() confirms this host's FFmpeg can run the CUDA chain.
+USE_NVENC = os.getenv("USE_NVENC") == "1"
+# Extra decoder surfaces let NVDEC decode ahead while filters/NVENC still hold frames
+HWACCEL_ARGS = [
+    "-hwaccel", "cuda",
+    "-hwaccel_output_format", "cuda",
+    "-extra_hw_frames", "8",
+]
+
+# Slideshow segments and background clips are encoded by parallel FFmpeg processes.
+# x264 scales poorly past a few threads, so several processes beat one; NVENC has a
+# single fixed-rate engine (and a session cap), so it gets one encode at a time.
+CPU_ENCODE_CONCURRENCY = max(1, (os.cpu_count() or 2) // 2)
+SEGMENT_MIN_SECONDS = 60  # shorter segments are not worth the extra process
+
+
+def _nvenc_enabled() -> bool:
+    """True if USE_NVENC=1 and the CUDA scale/pad + NVENC chain works here (probed once)."""
+    return USE_NVENC and nvenc_available()
 
 
-def download_media(url: str, dest: Path) -> None:
-    """Download a single media file (audio, image, or video) from URL to dest."""
-    with httpx.stream("GET", url, timeout=DOWNLOAD_TIMEOUT, follow_redirects=True) as r:
-        r.raise_for_status()
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        with open(dest, "wb") as f:
-            for chunk in r.iter_bytes():
-                f.write(chunk)
+def _encode_concurrency(use_nvenc: bool) -> int:
+    """How many encodes to run at once for the given backend."""
+    return 1 if use_nvenc else CPU_ENCODE_CONCURRENCY
+
+
+def _video_encoder_args(use_nvenc: bool, stills: bool = False, crf: int = 23) -> List[str]:
+    """
+    Return the FFmpeg video encoder arguments for the given backend.
+    stills=True tunes libx264 for slideshow content (identical frames, sparse keyframes).
+    crf is the constant quality level (NVENC: -cq).
+    """
+    if use_nvenc:
+        return [
+            "-c:v", "h264_nvenc",
+            "-preset", "p4",
+            "-tune", "hq",
+            "-rc", "vbr",
+            "-cq", str(crf),
+            "-b:v", "0",
+        ]
+    if stills:
+        return [
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            "-tune", "stillimage",
+            "-g", "300",
+            "-crf", str(crf),
+        ]
+    return ["-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode", "-crf", str(crf)]
+
+
+def _normalize_image(src: Path, dst: Path, width: int, height: int) -> None:
+    """
+    Fit an image into width x height (aspect preserved, black bars) and save it as PNG.
+    Done once per image so the encode does no per-frame scaling.
+    """
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        fitted = ImageOps.pad(img, (width, height), method=Image.Resampling.BICUBIC, color=(0, 0, 0))
+    fitted.save(dst, format="PNG", compress_level=1)
 
 
 def get_media_duration(path: Path) -> float:
@@ -33,15 +98,16 @@ def get_media_duration(path: Path) -> float:
             str(path),
         ],
         capture_output=True,
-        text=True,
         timeout=30,
     )
     if result.returncode != 0:
-        raise ValueError(f"Invalid media file: {result.stderr or result.stdout}")
+        err = (result.stderr or result.stdout).decode("utf-8", "replace")
+        raise ValueError(f"Invalid media file: {err}")
 
-    raw = (result.stdout or "").strip()
+    # Output is ASCII; float() parses the bytes directly
+    raw = result.stdout.strip()
     # ffprobe can return "N/A" or an empty string for some inputs
-    if not raw or raw.upper() == "N/A":
+    if not raw or raw.upper() == b"N/A":
         raise ValueError("Could not determine media duration (ffprobe returned N/A).")
 
     try:
@@ -52,52 +118,202 @@ def get_media_duration(path: Path) -> float:
     return duration
 
 
-def concatenate_audio(audio_paths: List[Path], output_path: Path) -> float:
+def get_media_durations(paths: List[Path]) -> List[float]:
+    """Durations of all given media files, probed in parallel (ffprobe runs outside the GIL)."""
+    with ThreadPoolExecutor(max_workers=max(1, min(PROBE_CONCURRENCY, len(paths)))) as ex:
+        return list(ex.map(get_media_duration, paths))
+
+
+def get_total_duration(paths: List[Path]) -> float:
+    """Sum of the durations of all given media files, in seconds."""
+    return sum(get_media_durations(paths))
+
+
+def _audio_concat_filter(start_idx: int, count: int) -> str:
     """
-    Concatenate multiple audio files into one.
-    Returns the total duration in seconds.
+    Filter graph branch that concatenates `count` audio inputs, starting at input
+    index start_idx, into [a]. Inputs are normalized first since concat needs
+    matching sample formats/rates/layouts.
     """
-    # Create a file list for FFmpeg concat demuxer
-    list_file = output_path.parent / "audio_list.txt"
-    with open(list_file, "w") as f:
-        for p in audio_paths:
-            f.write(f"file '{p.absolute()}'\n")
-    
-    cmd = [
-        "ffmpeg", "-y",
-        "-f", "concat",
-        "-safe", "0",
-        "-i", str(list_file),
-        "-c", "copy",
-        str(output_path),
+    parts = [
+        f"[{start_idx + j}:a]aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo[a{j}]"
+        for j in range(count)
     ]
+    parts.append("".join(f"[a{j}]" for j in range(count)) + f"concat=n={count}:v=0:a=1[a]")
+    return ";".join(parts)
+
+
+# Stream-copied audio is kept only up to this bitrate; anything above is re-encoded at 128k
+MAX_COPY_AUDIO_BITRATE = 192_000
+# Audio stream fields that must match across inputs for a concat demuxer copy
+_AUDIO_COPY_KEYS = ("codec_name", "profile", "sample_rate", "channels", "extradata_hash")
+
+
+def _audio_stream_params(path: Path) -> Optional[Dict[str, str]]:
+    """
+    codec_name, profile, sample_rate, channels, bit_rate and extradata_hash (SHA-256 of
+    the AudioSpecificConfig) of the first audio stream, or None if it cannot be probed.
+    """
+    try:
+        out = subprocess.check_output(
+            [
+                "ffprobe",
+                "-v", "error",
+                "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name,profile,sample_rate,channels,bit_rate,extradata_hash",
+                "-show_data_hash", "sha256",
+                "-of", "default=noprint_wrappers=1",
+                str(path),
+            ],
+            timeout=30,
+        )
+    except (subprocess.SubprocessError, OSError):
+        return None
+    params = dict(line.split("=", 1) for line in out.decode().splitlines() if "=" in line)
+    return params or None
+
+
+def _can_copy_audio(audio_paths: List[Path]) -> bool:
+    """
+    True when every input is AAC at no more than MAX_COPY_AUDIO_BITRATE with the same
+    profile, sample rate, channel count and extradata, so the tracks can be joined by the
+    concat demuxer and stream-copied instead of re-encoded.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(PROBE_CONCURRENCY, len(audio_paths)))) as ex:
+        params = list(ex.map(_audio_stream_params, audio_paths))
+    if any(p is None for p in params):
+        return False
+    first = [params[0].get(k) for k in _AUDIO_COPY_KEYS]
+    return (
+        params[0].get("codec_name") == "aac"
+        and None not in first
+        and all([p.get(k) for k in _AUDIO_COPY_KEYS] == first for p in params)
+        and all(
+            p.get("bit_rate", "").isdigit() and int(p["bit_rate"]) <= MAX_COPY_AUDIO_BITRATE
+            for p in params
+        )
+    )
+
+
+def _run_ffmpeg(cmd: List[str], error_prefix: str) -> None:
+    """Run an FFmpeg command. Raises RuntimeError with the stderr tail on failure."""
+    run_ffmpeg(cmd, timeout=7200, error_prefix=error_prefix)
+
+
+def _split_timeline(total: float, concurrency: int) -> List[Tuple[float, float]]:
+    """
+    Split [0, total) into up to `concurrency` (start, end) segments of at least
+    SEGMENT_MIN_SECONDS. Inner boundaries fall on whole seconds so they land on frames.
+    """
+    count = max(1, min(concurrency, int(total // SEGMENT_MIN_SECONDS)))
+    bounds = [float(round(k * total / count)) for k in range(count)] + [total]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _encode_thread_args(num_concurrent: int) -> List[str]:
+    """Share the CPU cores between concurrently running encodes."""
+    if num_concurrent == 1:
+        return []
+    return ["-threads", str(max(1, (os.cpu_count() or 2) // num_concurrent))]
+
+
+def _run_parallel(cmds: List[List[str]], error_prefix: str, concurrency: int) -> None:
+    """Run FFmpeg commands, up to `concurrency` at once, and wait for all of them."""
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(cmds)))) as ex:
+        list(ex.map(_run_ffmpeg, cmds, repeat(error_prefix)))
+
+
+def _mux_with_audio(
+    video_input: List[str],
+    audio_paths: List[Path],
+    output_path: Path,
+    final_duration: float,
+    error_prefix: str,
+) -> None:
+    """
+    Copy the already-encoded video from video_input (input 0) into the final output and
+    add the concatenated audio. Audio is stream-copied when all tracks are compatible AAC,
+    otherwise concatenated in the filter graph and encoded to AAC.
+    """
+    cmd = ["ffmpeg", "-y", *video_input]
+    audio_list = output_path.parent / "audio_list.txt"
+    copy_audio = _can_copy_audio(audio_paths)
+    if copy_audio:
+        write_concat_list(audio_list, audio_paths)
+        cmd.extend(["-f", "concat", "-safe", "0", "-i", str(audio_list)])
+        audio_args = ["-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "copy"]
+    else:
+        for ap in audio_paths:
+            cmd.extend(["-i", str(ap)])
+        audio_args = [
+            # Concatenate audio inputs (1..K) into [a]
+            "-filter_complex", _audio_concat_filter(1, len(audio_paths)),
+            "-map", "0:v",
+            "-map", "[a]",
+            "-c:v", "copy",
+            "-c:a", "aac",
+            "-b:a", "128k",
+        ]
+    cmd.extend([
+        *audio_args,
+        "-t", str(final_duration),  # Cap duration
+        "-shortest",
+        # Fragmented MP4: written progressively (no moov rewrite pass), playable while downloading
+        "-movflags", "+faststart+frag_keyframe+empty_moov",
+        "-frag_duration", "2000000",
+        "-write_tmcd", "0",
+        str(output_path),
+    ])
     
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-    if result.returncode != 0:
-        raise RuntimeError(f"Audio concatenation failed: {result.stderr[-1000:]}")
-    
-    # Get final duration
-    total_duration = get_media_duration(output_path)
-    list_file.unlink()
+    try:
+        _run_ffmpeg(cmd, error_prefix)
+    finally:
+        if copy_audio:
+            audio_list.unlink()
+
+
+def _write_slideshow_list(
+    list_file: Path,
+    image_paths: List[Path],
+    duration_per_image: float,
+    start: float,
+    end: float,
+) -> None:
+    """
+    Write a concat demuxer playlist showing each image for duration_per_image seconds,
+    clipped to the [start, end) window of the full slideshow.
+    """
+    entries = []
+    for i, img_path in enumerate(image_paths):
+        shown_from = max(start, i * duration_per_image)
+        shown_to = min(end, (i + 1) * duration_per_image)
+        if shown_to > shown_from:
+            entries.append((img_path, shown_to - shown_from))
     
-    return total_duration
+    with open(list_file, "w") as f:
+        for img_path, duration in entries:
+            f.write(f"file '{img_path.absolute()}'\nduration {duration}\n")
+        # The demuxer ignores the last entry's duration unless the file is repeated
+        f.write(f"file '{entries[-1][0].absolute()}'\n")
 
 
 def create_video_from_images(
     image_paths: List[Path],
-    audio_path: Path,
+    audio_paths: List[Path],
     output_path: Path,
     quality: str,
     audio_duration: float,
 ) -> float:
     """
     Create a video from images and audio.
-    Images are looped/cycled to match audio duration.
+    Images are looped/cycled to match audio duration. The video is encoded as parallel
+    segments which are then joined (stream copy) with the concatenated audio.
     Fixed aspect ratio: 16:9
     Resolution: 720p or 1080p
     Returns final video duration (capped at 2 hours).
     """
     width, height = (1280, 720) if quality == "720" else (1920, 1080)
+    work_dir = output_path.parent
     
     # Calculate how long each image should be displayed
     num_images = len(image_paths)
@@ -106,137 +322,165 @@ def create_video_from_images(
     # Cap total duration at 2 hours
     final_duration = min(audio_duration, MAX_LONGFORM_DURATION_SECONDS)
     
-    # Create input list with duration for each image
-    inputs = []
-    filter_parts = []
+    # Scale and pad each image to target resolution once, up front
+    norm_paths = [work_dir / f"norm_{i}.png" for i in range(num_images)]
+    with ThreadPoolExecutor(max_workers=max(1, min(os.cpu_count() or 1, num_images))) as ex:
+        list(ex.map(_normalize_image, image_paths, norm_paths, repeat(width), repeat(height)))
+    
+    # Images are already at target size: only set frame rate and pixel format (RGB PNG -> 4:2:0).
+    # Stills are decoded on the CPU and uploaded in the filter graph, so no -hwaccel here.
+    use_nvenc = _nvenc_enabled()
+    video_chain = "fps=30,format=nv12,hwupload_cuda" if use_nvenc else "fps=30,format=yuv420p"
+    
+    # One slideshow playlist (concat demuxer) and one encode per segment
+    concurrency = _encode_concurrency(use_nvenc)
+    segments = _split_timeline(final_duration, concurrency)
+    segment_cmds = []
+    segment_paths = []
+    list_files = []
+    for k, (seg_start, seg_end) in enumerate(segments):
+        list_file = work_dir / f"image_list_{k}.txt"
+        _write_slideshow_list(list_file, norm_paths, duration_per_image, seg_start, seg_end)
+        seg_path = work_dir / f"segment_{k}.mp4"
+        segment_cmds.append([
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", str(list_file),
+            "-vf", video_chain,
+            *_video_encoder_args(use_nvenc, stills=True),
+            *_encode_thread_args(len(segments)),
+            "-t", str(seg_end - seg_start),
+            "-an",
+            str(seg_path),
+        ])
+        segment_paths.append(seg_path)
+        list_files.append(list_file)
     
-    for i, img_path in enumerate(image_paths):
-        inputs.extend(["-loop", "1", "-t", str(duration_per_image), "-i", str(img_path)])
-        # Scale and pad each image to target resolution
-        filter_parts.append(
-            f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30[v{i}]"
+    try:
+        _run_parallel(segment_cmds, "Video creation failed", concurrency)
+    finally:
+        for list_file in list_files:
+            list_file.unlink()
+    
+    # Join the segments without re-encoding
+    segment_list = work_dir / "segment_list.txt"
+    write_concat_list(segment_list, segment_paths)
+    try:
+        _mux_with_audio(
+            ["-f", "concat", "-safe", "0", "-i", str(segment_list)],
+            audio_paths,
+            output_path,
+            final_duration,
+            "Video creation failed",
         )
-    
-    # Add audio input
-    inputs.extend(["-i", str(audio_path)])
-    audio_idx = num_images
-    
-    # Concatenate all scaled images
-    filter_parts.append(
-        "".join([f"[v{i}]" for i in range(num_images)]) +
-        f"concat=n={num_images}:v=1:a=0[v]"
-    )
-    
-    filter_complex = ";".join(filter_parts)
-    
-    cmd = [
-        "ffmpeg", "-y",
-        *inputs,
-        "-filter_complex", filter_complex,
-        "-map", "[v]",
-        "-map", f"{audio_idx}:a",
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "23",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-t", str(final_duration),  # Cap duration
-        "-shortest",
-        str(output_path),
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=7200)
-    if result.returncode != 0:
-        raise RuntimeError(f"Video creation failed: {result.stderr[-2000:]}")
+    finally:
+        segment_list.unlink()
+        for seg_path in segment_paths:
+            seg_path.unlink(missing_ok=True)
     
     return final_duration
 
 
+def _normalize_background_cmd(
+    src: Path, dst: Path, width: int, height: int, num_concurrent: int, use_nvenc: bool
+) -> List[str]:
+    """
+    FFmpeg command that re-encodes one background video at the target size and 30 fps,
+    without audio. All clips get identical encoding parameters so their outputs can be
+    concatenated and looped by stream copy.
+    """
+    # Resample to 30 fps first so scale/pad never touch frames fps would drop
+    # (high or misdetected source frame rates), then fix the pixel format
+    video_chain = f"fps=30,{fit_filter(width, height, use_nvenc)}"
+    if not use_nvenc:
+        video_chain += ",format=yuv420p"
+    
+    cmd = ["ffmpeg", "-y"]
+    # hwaccel flags must precede -i
+    if use_nvenc:
+        cmd.extend(HWACCEL_ARGS)
+    cmd.extend([
+        "-i", str(src),
+        "-vf", video_chain,
+        *_video_encoder_args(use_nvenc, crf=20),
+        *_encode_thread_args(num_concurrent),
+        "-an",
+        str(dst),
+    ])
+    return cmd
+
+
+def _normalize_backgrounds(
+    video_paths: List[Path], norm_paths: List[Path], width: int, height: int, error_prefix: str
+) -> None:
+    """
+    Normalize all background videos in parallel. If a CUDA run fails (e.g. NVDEC cannot
+    decode a source codec), every clip is redone with libx264: the outputs are joined by
+    stream copy, so they must all come from the same encoder.
+    """
+    use_nvenc = _nvenc_enabled()
+    while True:
+        concurrency = _encode_concurrency(use_nvenc)
+        num_concurrent = min(concurrency, len(video_paths))
+        cmds = [
+            _normalize_background_cmd(vp, norm_path, width, height, num_concurrent, use_nvenc)
+            for vp, norm_path in zip(video_paths, norm_paths)
+        ]
+        try:
+            _run_parallel(cmds, error_prefix, concurrency)
+            return
+        except RuntimeError:
+            if not use_nvenc:
+                raise
+            logger.warning("NVENC background normalize failed; retrying with libx264", exc_info=True)
+            use_nvenc = False
+
+
 def create_video_from_videos(
     video_paths: List[Path],
-    audio_path: Path,
+    audio_paths: List[Path],
     output_path: Path,
     quality: str,
     audio_duration: float,
 ) -> float:
     """
     Create a video from background videos and audio.
-    Videos are looped/concatenated and muted to match audio duration.
+    Each background video is normalized (size, fps, codec) once, in parallel; the
+    normalized clips are then looped by stream copy to match audio duration, muted, and
+    muxed with the concatenated audio without re-encoding the video again.
     Fixed aspect ratio: 16:9
     Resolution: 720p or 1080p
     Returns final video duration (capped at 2 hours).
     """
     width, height = (1280, 720) if quality == "720" else (1920, 1080)
+    work_dir = output_path.parent
+    error_prefix = "Video creation from videos failed"
     
     # Cap total duration at 2 hours
     final_duration = min(audio_duration, MAX_LONGFORM_DURATION_SECONDS)
     
-    # Get durations of all background videos
-    bg_durations = []
-    for vp in video_paths:
-        dur = get_media_duration(vp)
-        bg_durations.append(dur)
+    # Normalize each background video once instead of scaling/padding on every loop pass
+    norm_paths = [work_dir / f"norm_bg_{i}.mp4" for i in range(len(video_paths))]
+    _normalize_backgrounds(video_paths, norm_paths, width, height, error_prefix)
     
-    total_bg_duration = sum(bg_durations)
-    
-    # Calculate how many times we need to loop the videos
-    num_loops = int(final_duration / total_bg_duration) + 1
-    
-    # Build filter_complex
-    # Step 1: Scale and pad each background video
-    filter_parts = []
-    for i in range(len(video_paths)):
-        filter_parts.append(
-            f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30[v{i}]"
+    # Background playlist for the concat demuxer; -stream_loop rewinds it without buffering
+    # frames and -t/-shortest cut it at the audio length
+    list_file = work_dir / "bg_list.txt"
+    write_concat_list(list_file, norm_paths)
+    try:
+        _mux_with_audio(
+            ["-stream_loop", "-1", "-f", "concat", "-safe", "0", "-i", str(list_file)],
+            audio_paths,
+            output_path,
+            final_duration,
+            error_prefix,
         )
-    
-    # Step 2: Concatenate background videos
-    concat_inputs = "".join([f"[v{i}]" for i in range(len(video_paths))])
-    filter_parts.append(f"{concat_inputs}concat=n={len(video_paths)}:v=1:a=0[vbg]")
-    
-    # Step 3: Loop the video to match audio duration
-    # Use loop filter: loop=-1 means infinite loop, we'll cut it with -t
-    filter_parts.append(f"[vbg]loop=loop={num_loops}:size=32767:start=0[vloop]")
-    
-    filter_complex = ";".join(filter_parts)
-    
-    # Audio input index
-    audio_idx = len(video_paths)
-    
-    cmd = [
-        "ffmpeg", "-y",
-    ]
-    
-    # Add all background videos as inputs
-    for vp in video_paths:
-        cmd.extend(["-i", str(vp)])
-    
-    # Add audio input
-    cmd.extend(["-i", str(audio_path)])
-    
-    cmd.extend([
-        "-filter_complex", filter_complex,
-        "-map", "[vloop]",
-        "-map", f"{audio_idx}:a",
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "23",
-        "-c:a", "aac",
-        "-b:a", "128k",
-        "-t", str(final_duration),  # Cap at exact duration
-        str(output_path),
-    ])
-    
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=7200)
-    if result.returncode != 0:
-        raise RuntimeError(f"Video creation from videos failed: {result.stderr[-2000:]}")
+    finally:
+        list_file.unlink()
     
     return final_duration
 
 
-def process_longform_video(
+async def process_longform_video(
     audio_urls: List[str],
     background_source: str,
     background_urls: List[str],
@@ -245,6 +489,7 @@ def process_longform_video(
 ) -> Tuple[Path, float]:
     """
     Main processing function for longform videos.
+    Downloads run concurrently on the event loop; FFmpeg steps run in worker threads.
     
     Args:
         audio_urls: List of audio file URLs (1-30)
@@ -256,47 +501,42 @@ def process_longform_video(
     Returns:
         (output_path, duration_seconds)
     """
-    # Download all audio files
-    audio_paths = []
-    for i, url in enumerate(audio_urls):
-        dest = temp_dir / f"audio_{i}.mp3"
-        download_media(url, dest)
-        audio_paths.append(dest)
+    audio_paths = [temp_dir / f"audio_{i}.mp3" for i in range(len(audio_urls))]
+    if background_source == "images":
+        ext = "jpg"  # Could be improved by detecting from URL
+        bg_paths = [temp_dir / f"bg_{i}.{ext}" for i in range(len(background_urls))]
+    else:
+        bg_paths = [temp_dir / f"bg_video_{i}.mp4" for i in range(len(background_urls))]
+    
+    # Download all audio and background media in one concurrent batch
+    for error in await download_files(audio_urls + background_urls, audio_paths + bg_paths):
+        if error is not None:
+            raise error
     
-    # Concatenate audio files
-    combined_audio = temp_dir / "combined_audio.mp3"
-    total_audio_duration = concatenate_audio(audio_paths, combined_audio)
+    # Audio is concatenated inside the final encode; only its total length is needed here
+    total_audio_duration = await asyncio.to_thread(get_total_duration, audio_paths)
     
     # Cap audio duration at 2 hours
     if total_audio_duration > MAX_LONGFORM_DURATION_SECONDS:
         total_audio_duration = MAX_LONGFORM_DURATION_SECONDS
     
-    # Download background media
-    bg_paths = []
-    for i, url in enumerate(background_urls):
-        if background_source == "images":
-            ext = "jpg"  # Could be improved by detecting from URL
-            dest = temp_dir / f"bg_{i}.{ext}"
-        else:
-            dest = temp_dir / f"bg_video_{i}.mp4"
-        download_media(url, dest)
-        bg_paths.append(dest)
-    
     # Create final video
     output_path = temp_dir / "longform_output.mp4"
     
     if background_source == "images":
-        final_duration = create_video_from_images(
+        final_duration = await asyncio.to_thread(
+            create_video_from_images,
             bg_paths,
-            combined_audio,
+            audio_paths,
             output_path,
             quality,
             total_audio_duration,
         )
     else:  # videos
-        final_duration = create_video_from_videos(
+        final_duration = await asyncio.to_thread(
+            create_video_from_videos,
             bg_paths,
-            combined_audio,
+            audio_paths,
             output_path,
             quality,
             total_audio_duration,
@@ -1,5 +1,6 @@
 """Upload merged video to Railway bucket (S3-compatible)."""
 import os
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
 import boto3
@@ -12,8 +13,9 @@ SECRET_KEY = os.getenv("SECRET_ACCESS_KEY")
 REGION = os.getenv("REGION", "auto")
 
 
+@lru_cache(maxsize=1)
 def get_client():
-    """Build S3 client for Railway storage."""
+    """Build S3 client for Railway storage (cached; boto3 clients are thread-safe)."""
     return boto3.client(
         "s3",
         endpoint_url=ENDPOINT,
@@ -0,0 +1,19 @@
+"""Scratch directories for downloads and FFmpeg intermediates."""
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+def temp_base() -> Optional[str]:
+    """
+    Parent directory for scratch dirs: TMP_DIR if set, else None (the system default).
+    tmpfs (e.g. TMP_DIR=/dev/shm) is opt-in: a long job keeps downloads, intermediates and
+    the output at once, which on a RAM-backed mount can exhaust memory for the whole API.
+    """
+    return os.getenv("TMP_DIR") or None
+
+
+def make_temp_dir(prefix: Optional[str] = None) -> Path:
+    """Create a new scratch directory and return its path."""
+    return Path(tempfile.mkdtemp(prefix=prefix, dir=temp_base()))
@@ -1,10 +1,17 @@
 """Download videos, validate duration, merge with FFmpeg (scale, pad, xfade)."""
+import asyncio
+import functools
+import logging
+import os
 import subprocess
 import tempfile
+from itertools import accumulate
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, NamedTuple, Optional, Tuple, Union
 
-import httpx
+from utils.ffmpeg import run_ffmpeg_async, write_concat_list
+
+logger = logging.getLogger(__name__)
 
 # Target dimensions: (width, height) for quality + aspect_ratio
 DIMENSIONS = {
@@ -15,12 +22,46 @@ DIMENSIONS = {
     ("1080", "9:16"): (1080, 1920),
     ("1080", "1:1"): (1080, 1080),
 }
+# Valid (quality, aspect_ratio) pairs, for validating requests before any work starts
+RESOLUTION_KEYS = frozenset(DIMENSIONS)
 
 MAX_DURATION_SECONDS = 7200  # 2 hours
 XFADE_DURATION = 0.5
-DOWNLOAD_TIMEOUT = 300  # 5 min per file
+PROBE_CONCURRENCY = 8  # concurrent ffprobe processes per request
+# Parallel per-clip normalize encodes (each ffmpeg keeps ~2 cores busy)
+NORMALIZE_CONCURRENCY = max(1, (os.cpu_count() or 2) // 2)
+NVENC_NORMALIZE_CONCURRENCY = 2  # consumer GPUs cap concurrent NVENC sessions
+# Opt-in GPU path for merges (same flag as longform); libx264 otherwise
+USE_NVENC = os.getenv("USE_NVENC") == "1"
 
 
+@functools.lru_cache(maxsize=None)
+def nvenc_available() -> bool:
+    """
+    True if FFmpeg can run the GPU merge chain on this host: hwupload_cuda, scale_cuda with
+    force_original_aspect_ratio/format (FFmpeg 8.0+), pad_cuda, and h264_nvenc with a GPU
+    present. Checked once with a tiny test encode through that chain; the result is cached.
+    NVDEC support for a given input codec cannot be checked up front, so the merge still
+    falls back to libx264 if a CUDA run fails.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-v", "error",
+                "-f", "lavfi", "-i", "color=size=256x256:duration=0.1",
+                "-vf", f"format=nv12,hwupload_cuda,{fit_filter(320, 240, True)}",
+                "-frames:v", "1", "-c:v", "h264_nvenc",
+                "-f", "null", "-",
+            ],
+            capture_output=True,
+            timeout=30,
+        )
+    except (subprocess.SubprocessError, OSError):
+        return False
+    return result.returncode == 0
+
+
+@functools.lru_cache(maxsize=None)
 def get_dimensions(quality: str, aspect_ratio: str) -> Tuple[int, int]:
     """Return (width, height) for the given quality and aspect ratio."""
     key = (quality, aspect_ratio)
@@ -29,62 +70,285 @@ def get_dimensions(quality: str, aspect_ratio: str) -> Tuple[int, int]:
     return DIMENSIONS[key]
 
 
-def download_video(url: str, dest: Path) -> None:
-    """Download a single video from URL to dest. Raises on failure."""
-    with httpx.stream("GET", url, timeout=DOWNLOAD_TIMEOUT, follow_redirects=True) as r:
-        r.raise_for_status()
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        with open(dest, "wb") as f:
-            for chunk in r.iter_bytes():
-                f.write(chunk)
+async def _run_async(cmd: List[str], timeout: float, text: bool = True) -> subprocess.CompletedProcess:
+    """
+    Run a command without blocking the event loop. Mirrors
+    subprocess.run(cmd, capture_output=True, text=text, timeout=timeout).
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    if text:
+        stdout, stderr = stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace")
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class VideoInfo(NamedTuple):
+    """Probe result for one input file. Codec names are ffprobe's (e.g. 'h264', 'aac')."""
+    duration: float
+    has_audio: bool
+    width: Optional[int]
+    height: Optional[int]
+    video_codec: Optional[str]
+    audio_codec: Optional[str]
+    # Stream parameters that must match across inputs for a -c copy concat
+    pix_fmt: Optional[str] = None
+    profile: Optional[str] = None
+    r_frame_rate: Optional[str] = None
+    time_base: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    audio_profile: Optional[str] = None
+    # SHA-256 of each stream's codec extradata (H.264 SPS/PPS, AAC AudioSpecificConfig)
+    video_extradata_hash: Optional[str] = None
+    audio_extradata_hash: Optional[str] = None
 
 
 def get_duration_and_has_audio(path: Path) -> Tuple[float, bool]:
+    """Sync wrapper around get_duration_and_has_audio_async (CLI/test use)."""
+    return asyncio.run(get_duration_and_has_audio_async(path))
+
+
+async def get_duration_and_has_audio_async(path: Path) -> Tuple[float, bool]:
     """Use ffprobe to get duration in seconds and whether the file has audio. Raises if invalid."""
-    result = subprocess.run(
+    info = await probe_video_async(path)
+    return info.duration, info.has_audio
+
+
+async def probe_video_async(path: Path) -> VideoInfo:
+    """
+    Use ffprobe to get duration, audio presence, and the size/codec of the first video
+    and audio streams. Raises ValueError if the file is invalid.
+    """
+    # ffprobe's key=value output is ASCII: parse the raw bytes, decode only what is kept
+    result = await _run_async(
         [
             "ffprobe",
             "-v", "error",
-            "-show_entries", "format=duration:stream=codec_type",
-            "-of", "default=noprint_wrappers=1",
+            "-show_entries",
+            "format=duration:stream=codec_type,codec_name,width,height,pix_fmt,profile,"
+            "r_frame_rate,time_base,sample_rate,channels,extradata_hash",
+            "-show_data_hash", "sha256",
+            "-of", "default",
             str(path),
         ],
-        capture_output=True,
-        text=True,
         timeout=30,
+        text=False,
     )
     if result.returncode != 0:
-        raise ValueError(f"Invalid or unsupported video: {result.stderr or result.stdout}")
+        err = (result.stderr or result.stdout).decode("utf-8", "replace")
+        raise ValueError(f"Invalid or unsupported video: {err}")
 
     duration = None
-    has_audio = False
-    for line in (result.stdout or "").strip().split("\n"):
-        if line.startswith("duration="):
+    streams: List[dict] = []
+    section: Optional[dict] = None
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line == b"[STREAM]":
+            section = {}
+            streams.append(section)
+        elif line.startswith(b"[/") or line == b"[FORMAT]":
+            section = None
+        elif line.startswith(b"duration="):
             try:
-                duration = float(line.split("=", 1)[1].strip())
-            except (IndexError, ValueError):
+                duration = float(line[9:])
+            except ValueError:
                 pass
-        if line.strip() == "codec_type=audio":
-            has_audio = True
+        elif section is not None and b"=" in line:
+            key, value = line.split(b"=", 1)
+            section[key] = value
 
     if duration is None:
         # Fallback: only format duration
-        result2 = subprocess.run(
+        result2 = await _run_async(
             [
                 "ffprobe", "-v", "error",
                 "-show_entries", "format=duration",
                 "-of", "default=noprint_wrappers=1:nokey=1",
                 str(path),
             ],
-            capture_output=True,
-            text=True,
             timeout=30,
+            text=False,
         )
         if result2.returncode != 0:
             raise ValueError("Could not get duration")
-        duration = float((result2.stdout or "").strip())
+        duration = float(result2.stdout.strip())
+
+    video = next((st for st in streams if st.get(b"codec_type") == b"video"), {})
+    audio = next((st for st in streams if st.get(b"codec_type") == b"audio"), None)
+
+    def text(stream: Optional[dict], key: bytes) -> Optional[str]:
+        value = stream.get(key) if stream else None
+        return value.decode() if value and value != b"N/A" else None
+
+    def number(stream: Optional[dict], key: bytes) -> Optional[int]:
+        value = stream.get(key) if stream else None
+        return int(value) if value and value.isdigit() else None
+
+    return VideoInfo(
+        duration=duration,
+        has_audio=audio is not None,
+        width=number(video, b"width"),
+        height=number(video, b"height"),
+        video_codec=text(video, b"codec_name"),
+        audio_codec=text(audio, b"codec_name"),
+        pix_fmt=text(video, b"pix_fmt"),
+        profile=text(video, b"profile"),
+        r_frame_rate=text(video, b"r_frame_rate"),
+        time_base=text(video, b"time_base"),
+        sample_rate=number(audio, b"sample_rate"),
+        channels=number(audio, b"channels"),
+        audio_profile=text(audio, b"profile"),
+        video_extradata_hash=text(video, b"extradata_hash"),
+        audio_extradata_hash=text(audio, b"extradata_hash"),
+    )
+
+
+async def probe_all(
+    paths: List[Path],
+    concurrency: int = PROBE_CONCURRENCY,
+) -> List[Union[VideoInfo, BaseException]]:
+    """
+    Probe all files concurrently (at most `concurrency` ffprobe processes at once).
+    Returns one entry per path: its VideoInfo, or the exception raised.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def bounded(path: Path) -> VideoInfo:
+        async with sem:
+            return await probe_video_async(path)
+
+    return await asyncio.gather(*(bounded(p) for p in paths), return_exceptions=True)
+
+
+def can_stream_copy(infos: List[VideoInfo], width: int, height: int) -> bool:
+    """
+    True if every input is already h264/aac at width x height and all inputs share the
+    stream parameters the concat demuxer cannot reconcile without re-encoding (H.264
+    profile, pix_fmt, frame rate, time base, audio profile, sample rate and channel count).
+    The codec extradata must be identical too: the output keeps only the first input's
+    SPS/PPS and AudioSpecificConfig, so any other set would make later clips undecodable.
+    """
+    def params(i: VideoInfo) -> Tuple:
+        return (
+            i.pix_fmt, i.profile, i.r_frame_rate, i.time_base, i.video_extradata_hash,
+            i.audio_profile, i.sample_rate, i.channels, i.audio_extradata_hash,
+        )
+
+    first = params(infos[0])
+    return None not in first and all(
+        (i.width, i.height) == (width, height)
+        and i.video_codec == "h264"
+        and i.audio_codec == "aac"
+        and params(i) == first
+        for i in infos
+    )
+
+
+async def concat_copy_async(paths: List[Path], output_path: Path) -> None:
+    """Join inputs end to end with the concat demuxer and stream copy (no decode/encode)."""
+    list_file = output_path.with_suffix(".concat.txt")
+    write_concat_list(list_file, paths)
+    try:
+        await run_ffmpeg_async(
+            [
+                "ffmpeg", "-y",
+                "-f", "concat", "-safe", "0", "-i", str(list_file),
+                "-c", "copy",
+                "-movflags", "+faststart",
+                str(output_path),
+            ],
+            timeout=3600,
+            error_prefix="FFmpeg concat failed",
+        )
+    finally:
+        list_file.unlink(missing_ok=True)
+
+
+def fit_filter(w: int, h: int, use_nvenc: bool) -> str:
+    """Scale to fit w x h and pad the rest black. With NVENC, frames stay in GPU memory (NV12)."""
+    if use_nvenc:
+        return (
+            f"scale_cuda={w}:{h}:force_original_aspect_ratio=decrease:format=nv12,"
+            f"pad_cuda={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+    return (
+        f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+        f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+    )
 
-    return duration, has_audio
+
+def _normalize_cmd(path: Path, w: int, h: int, dest: Path, use_nvenc: bool, threads: int) -> List[str]:
+    """Single-input FFmpeg command for normalize_clip, limited to `threads` threads."""
+    cmd = ["ffmpeg", "-y"]
+    if use_nvenc:
+        cmd.extend(["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"])
+        video_codec = ["-c:v", "h264_nvenc", "-preset", "p1", "-rc", "constqp", "-qp", "18"]
+    else:
+        # CRF 17 rather than -qp 0: visually lossless at a fraction of the scratch space
+        video_codec = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "17"]
+    cmd.extend([
+        "-i", str(path),
+        "-vf", fit_filter(w, h, use_nvenc),
+        *video_codec,
+        "-threads", str(threads),
+        "-c:a", "copy",
+        str(dest),
+    ])
+    return cmd
+
+
+async def normalize_clip(
+    path: Path, w: int, h: int, dest: Path, use_nvenc: bool = False, threads: int = 0
+) -> Path:
+    """
+    Scale/pad one clip to w x h and re-encode it as a near-lossless, fast-to-decode
+    intermediate (audio is copied as-is). If the CUDA run fails (e.g. NVDEC cannot decode
+    the input codec), the clip is redone with libx264. threads caps FFmpeg's threads
+    (0 = automatic). Returns dest.
+    """
+    if use_nvenc:
+        try:
+            await run_ffmpeg_async(
+                _normalize_cmd(path, w, h, dest, True, threads), timeout=3600, error_prefix="FFmpeg normalize failed"
+            )
+            return dest
+        except RuntimeError:
+            logger.warning("NVENC normalize failed for %s; retrying with libx264", path.name, exc_info=True)
+    await run_ffmpeg_async(
+        _normalize_cmd(path, w, h, dest, False, threads), timeout=3600, error_prefix="FFmpeg normalize failed"
+    )
+    return dest
+
+
+async def normalize_clips(paths: List[Path], w: int, h: int, work_dir: Path, use_nvenc: bool = False) -> List[Path]:
+    """
+    Run normalize_clip for every input in parallel (NORMALIZE_CONCURRENCY processes, fewer
+    with NVENC), splitting the CPU cores between them so parallel x264 runs do not
+    oversubscribe it. Intermediates are written to work_dir as norm_<i>.mkv. Raises the
+    first failure once all runs have finished.
+    """
+    concurrency = NVENC_NORMALIZE_CONCURRENCY if use_nvenc else NORMALIZE_CONCURRENCY
+    sem = asyncio.Semaphore(concurrency)
+    threads = max(1, (os.cpu_count() or 2) // max(1, min(concurrency, len(paths))))
+
+    async def bounded(i: int, path: Path) -> Path:
+        async with sem:
+            return await normalize_clip(path, w, h, work_dir / f"norm_{i}.mkv", use_nvenc, threads)
+
+    results = await asyncio.gather(*(bounded(i, p) for i, p in enumerate(paths)), return_exceptions=True)
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+    return results
 
 
 def merge_videos(
@@ -94,15 +358,130 @@ def merge_videos(
     output_path: Path,
     durations: List[float],
     has_audio_list: List[bool],
+    encoder: str = "auto",
+    x264_preset: str = "veryfast",
+    x264_crf: int = 22,
+    fast_decode: bool = False,
+    transitions: bool = True,
+    infos: Optional[List[VideoInfo]] = None,
+    normalize_first: bool = True,
+) -> float:
+    """Sync wrapper around merge_videos_async (CLI/test use)."""
+    return asyncio.run(merge_videos_async(
+        paths,
+        quality,
+        aspect_ratio,
+        output_path,
+        durations,
+        has_audio_list,
+        encoder=encoder,
+        x264_preset=x264_preset,
+        x264_crf=x264_crf,
+        fast_decode=fast_decode,
+        transitions=transitions,
+        infos=infos,
+        normalize_first=normalize_first,
+    ))
+
+
+async def merge_videos_async(
+    paths: List[Path],
+    quality: str,
+    aspect_ratio: str,
+    output_path: Path,
+    durations: List[float],
+    has_audio_list: List[bool],
+    encoder: str = "auto",
+    x264_preset: str = "veryfast",
+    x264_crf: int = 22,
+    fast_decode: bool = False,
+    transitions: bool = True,
+    infos: Optional[List[VideoInfo]] = None,
+    normalize_first: bool = True,
 ) -> float:
     """
-    Merge videos with scale, pad, xfade (video) and acrossfade (audio).
+    Merge videos with scale, pad, xfade (video) and acrossfade (audio), or hard cuts
+    when transitions=False.
     paths, durations, and has_audio_list must have the same length.
+    encoder: 'nvenc' (CUDA decode + h264_nvenc), 'libx264', or 'auto' (nvenc only when
+        USE_NVENC=1 and nvenc_available(), else libx264).
+    x264_preset / x264_crf: libx264 speed/size tradeoff. Rough guide at 1080p vs medium:
+        medium    1x speed    baseline size
+        veryfast  ~2x faster  slightly larger (CRF 22 keeps quality comparable)
+        superfast ~3x faster  noticeably larger
+    fast_decode: add -tune fastdecode (cheaper playback for streamed output).
+    transitions=False: clips are joined end to end with no crossfade. If `infos` (from
+    probe_all) shows every input already h264/aac at the target size with matching stream
+    parameters (can_stream_copy), they are joined with the concat demuxer and stream copied;
+    otherwise they are scaled/padded and re-encoded through the concat filter.
+    normalize_first: scale/pad every clip in its own parallel ffmpeg (normalize_clips), so the
+    final pass decodes ready-sized intermediates instead of fitting all inputs in one
+    process. Intermediates are deleted afterwards.
+    FFmpeg runs as an asyncio subprocess, so the event loop is not blocked.
     Returns total output duration in seconds.
     """
     if len(paths) < 2:
         raise ValueError("At least 2 videos required")
     w, h = get_dimensions(quality, aspect_ratio)
+    if not transitions and infos is not None and can_stream_copy(infos, w, h):
+        await concat_copy_async(paths, output_path)
+        return sum(durations)
+    if encoder == "auto":
+        # nvenc_available() runs a test encode on first call; cached afterwards
+        encoder = "nvenc" if USE_NVENC and await asyncio.to_thread(nvenc_available) else "libx264"
+    if encoder not in ("nvenc", "libx264"):
+        raise ValueError(f"Unsupported encoder: {encoder}")
+    use_nvenc = encoder == "nvenc"
+
+    # 1) Scale and pad each video to w x h, either up front in parallel processes or
+    # inside the merge graph below
+    normalized: List[Path] = []
+    try:
+        if normalize_first:
+            normalized = await normalize_clips(paths, w, h, output_path.parent, use_nvenc)
+        inputs = normalized or paths
+        try:
+            await _encode_merge(
+                inputs, w, h, output_path, durations, has_audio_list, use_nvenc, normalize_first,
+                x264_preset, x264_crf, fast_decode, transitions,
+            )
+        except RuntimeError:
+            if not use_nvenc:
+                raise
+            # e.g. NVDEC cannot decode an input codec: redo the merge on the CPU
+            logger.warning("NVENC merge failed; retrying with libx264", exc_info=True)
+            await _encode_merge(
+                inputs, w, h, output_path, durations, has_audio_list, False, normalize_first,
+                x264_preset, x264_crf, fast_decode, transitions,
+            )
+    finally:
+        for p in normalized:
+            p.unlink(missing_ok=True)
+
+    if not transitions:
+        return sum(durations)
+    return sum(durations) - (len(paths) - 1) * XFADE_DURATION
+
+
+async def _encode_merge(
+    paths: List[Path],
+    w: int,
+    h: int,
+    output_path: Path,
+    durations: List[float],
+    has_audio_list: List[bool],
+    use_nvenc: bool,
+    prescaled: bool,
+    x264_preset: str,
+    x264_crf: int,
+    fast_decode: bool,
+    transitions: bool = True,
+) -> None:
+    """
+    Single FFmpeg run for merge_videos_async: xfade/acrossfade all inputs (or, with
+    transitions=False, join them with hard cuts through the concat filter) and encode.
+    prescaled: inputs are already w x h (normalize_clips), so no per-input scale/pad.
+    """
     n = len(paths)
     transition = XFADE_DURATION
     need_silence = not all(has_audio_list)
@@ -110,69 +489,90 @@ def merge_videos(
     silence_idx = n
 
     # Build filter_complex
-    # 1) Scale and pad each video to w x h
-    video_filters = []
-    for i in range(n):
-        video_filters.append(
-            f"[{i}:v]scale={w}:{h}:force_original_aspect_ratio=decrease,"
-            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1[v{i}]"
-        )
-    video_part = ";".join(video_filters)
-
-    # 2) xfade chain: [v0][v1]xfade -> [v01], [v01][v2]xfade -> [v03], ... (for n=2 only [v01] exists)
-    offset = durations[0] - transition
-    xfade_parts = [f"[v0][v1]xfade=transition=fade:duration={transition}:offset={offset}[v01]"]
-    for i in range(2, n):
-        prev_label = "v01" if i == 2 else f"v0{i}"
-        curr_label = f"v0{i + 1}"
-        offset = sum(durations[:i]) - i * transition
-        xfade_parts.append(
-            f"[{prev_label}][v{i}]xfade=transition=fade:duration={transition}:offset={offset}[{curr_label}]"
-        )
-    last_video = "v01" if n == 2 else f"v0{n}"
+    # 1) Scale and pad each video to w x h (unless prescaled)
+    # With NVENC, frames stay in GPU memory for scale/pad and are downloaded once
+    # (as NV12) for xfade, which only runs on the CPU
+    if prescaled:
+        fit_chain = "setsar=1"
+    elif use_nvenc:
+        fit_chain = f"{fit_filter(w, h, True)},hwdownload,format=nv12"
+    else:
+        fit_chain = fit_filter(w, h, False)
+
+    # All filter chains go into one list, joined once at the end
+    parts = [f"[{i}:v]{fit_chain}[v{i}]" for i in range(n)]
 
-    # 3) Audio: [i:a] or [silence_idx:a] trimmed to duration -> [ai]; then acrossfade chain
-    audio_prep = []
+    # 2) Audio: [i:a] or [silence_idx:a] trimmed to duration -> [ai]
     for i in range(n):
         if has_audio_list[i]:
-            audio_prep.append(
+            parts.append(
                 f"[{i}:a]aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo,"
                 f"atrim=0:{durations[i]},asetpts=PTS-STARTPTS[a{i}]"
             )
         else:
-            audio_prep.append(
-                f"[{silence_idx}:a]atrim=0:{durations[i]},asetpts=PTS-STARTPTS[a{i}]"
+            parts.append(f"[{silence_idx}:a]atrim=0:{durations[i]},asetpts=PTS-STARTPTS[a{i}]")
+
+    if transitions:
+        # 3) xfade chain: [v0][v1]xfade -> [v01], [v01][v2]xfade -> [v03], ... (for n=2 only [v01] exists)
+        # offsets[i - 1] is where clip i starts fading in: sum(durations[:i]) - i * transition,
+        # from one running sum instead of re-summing the prefix per clip
+        offsets = [end - (i + 1) * transition for i, end in enumerate(accumulate(durations[:-1]))]
+        prev_label = "v0"
+        for i in range(1, n):
+            curr_label = "v01" if i == 1 else f"v0{i + 1}"
+            parts.append(
+                f"[{prev_label}][v{i}]xfade=transition=fade:duration={transition}:offset={offsets[i - 1]}[{curr_label}]"
             )
-    audio_prep_str = ";".join(audio_prep)
-    acrossfade_parts = [f"[a0][a1]acrossfade=d={transition}:c1=tri:c2=tri[a01]"]
-    for i in range(2, n):
-        prev = "a01" if i == 2 else f"a0{i}"
-        curr = f"a0{i + 1}"
-        acrossfade_parts.append(f"[{prev}][a{i}]acrossfade=d={transition}:c1=tri:c2=tri[{curr}]")
-    last_audio = "a01" if n == 2 else f"a0{n}"
-    filter_complex = (
-        f"{video_part};"
-        f"{';'.join(xfade_parts)};"
-        f"{audio_prep_str};"
-        f"{';'.join(acrossfade_parts)}"
-    )
-    filter_complex += f";[{last_video}][{last_audio}]concat=n=1:v=1:a=1[outv][outa]"
+            prev_label = curr_label
+        last_video = prev_label
 
-    cmd = ["ffmpeg", "-y"]
+        # 4) acrossfade chain over the audio branches
+        parts.append(f"[a0][a1]acrossfade=d={transition}:c1=tri:c2=tri[a01]")
+        for i in range(2, n):
+            prev = "a01" if i == 2 else f"a0{i}"
+            parts.append(f"[{prev}][a{i}]acrossfade=d={transition}:c1=tri:c2=tri[a0{i + 1}]")
+        last_audio = "a01" if n == 2 else f"a0{n}"
+        parts.append(f"[{last_video}][{last_audio}]concat=n=1:v=1:a=1[outv][outa]")
+    else:
+        # 3) Hard cuts: one concat over all (video, audio) segment pairs
+        segments = "".join(f"[v{i}][a{i}]" for i in range(n))
+        parts.append(f"{segments}concat=n={n}:v=1:a=1[outv][outa]")
+    filter_complex = ";".join(parts)
+    # Passed as a file: the graph grows with clip count and would otherwise bloat argv
+    script_path = output_path.with_suffix(".fc.txt")
+    script_path.write_text(filter_complex)
+
+    if use_nvenc:
+        video_codec = ["-c:v", "h264_nvenc", "-preset", "p4", "-rc", "vbr", "-cq", "23", "-b:v", "0"]
+    else:
+        # Slice-based threading keeps every core busy even on short clips where
+        # frame threading has too little lookahead to fill all threads
+        video_codec = [
+            "-c:v", "libx264", "-preset", x264_preset, "-crf", str(x264_crf),
+            "-x264-params", "sliced-threads=1",
+        ]
+        if fast_decode:
+            video_codec.extend(["-tune", "fastdecode"])
+
+    # Run the per-input scale/pad chains and the audio branch on all cores
+    filter_threads = str(os.cpu_count() or 4)
+    cmd = ["ffmpeg", "-y", "-filter_threads", filter_threads, "-filter_complex_threads", filter_threads]
     for p in paths:
+        # NVDEC decode into GPU memory; hwaccel flags must precede -i
+        if use_nvenc and not prescaled:
+            cmd.extend(["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"])
         cmd.extend(["-i", str(p)])
     if need_silence:
         cmd.extend(["-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo"])
     cmd.extend([
-        "-filter_complex", filter_complex,
+        "-filter_complex_script", str(script_path),
         "-map", "[outv]", "-map", "[outa]",
-        "-c:v", "libx264", "-preset", "medium", "-crf", "23",
+        "-threads", "0",
+        *video_codec,
         "-c:a", "aac", "-b:a", "128k",
         str(output_path),
     ])
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)
-    if result.returncode != 0:
-        raise RuntimeError(f"FFmpeg failed: {result.stderr[-2000:] if result.stderr else result.stdout}")
-
-    total_duration = sum(durations) - (n - 1) * transition
-    return total_duration
+    try:
+        await run_ffmpeg_async(cmd, timeout=3600, error_prefix="FFmpeg failed")
+    finally:
+        script_path.unlink(missing_ok=True)
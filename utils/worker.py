@@ -1,19 +1,25 @@
 """Background worker for processing async longform video jobs."""
 import asyncio
 import logging
+import os
 import tempfile
 import time
 import uuid
 from pathlib import Path
+from typing import Set
 
-from utils.db import get_pending_jobs, update_job_status, update_job_result
+from utils.db import get_pending_jobs, update_job_status, update_job_result, wait_for_new_job
 from utils.longform_processor import process_longform_video
 from utils.storage import upload_merged_video
+from utils.tempdir import temp_base
 
 logger = logging.getLogger(__name__)
 
-WORKER_POLL_INTERVAL = 5  # seconds
+WORKER_POLL_INTERVAL = 5  # seconds to back off after a worker loop error
+WORKER_IDLE_POLL_INTERVAL = 60  # failsafe poll when no new-job signal arrives
 WORKER_ENABLED = True
+# Jobs processed at the same time; each longform job already encodes in parallel segments
+MAX_CONCURRENT_JOBS = max(1, int(os.getenv("WORKER_CONCURRENCY", "2")))
 
 
 async def process_job(job: dict) -> None:
@@ -21,80 +27,91 @@ async def process_job(job: dict) -> None:
     job_id = job["id"]
     logger.info(f"Processing job {job_id}")
     
-    # Update status to processing
-    await update_job_status(job_id, "processing")
-    
+    # Status is already 'processing': get_pending_jobs claims jobs atomically
     start_time = time.perf_counter()
-    temp_dir = Path(tempfile.mkdtemp())
     
+    completed = False
     try:
-        # Process the video in a thread pool to avoid blocking the event loop
-        loop = asyncio.get_event_loop()
-        output_path, duration = await loop.run_in_executor(
-            None,  # Use default thread pool
-            process_longform_video,
-            job["audio_urls"],
-            job["background_source"],
-            job["background_urls"],
-            job["quality"],
-            temp_dir,
-        )
-        
-        # Upload result (also blocking, run in thread pool)
-        result_url = await loop.run_in_executor(
-            None,
-            upload_merged_video,
-            output_path,
-            f"longform-{job_id[:12]}",
-        )
-        
-        processing_time = time.perf_counter() - start_time
-        
-        # Update job with result
-        await update_job_result(
-            job_id=job_id,
-            result_url=result_url,
-            duration_seconds=duration,
-            processing_time=processing_time,
-        )
-        
-        logger.info(f"Job {job_id} completed successfully in {processing_time:.2f}s")
+        # Removed with everything in it (including subdirectories) when the block exits
+        with tempfile.TemporaryDirectory(prefix=f"job-{job_id[:8]}-", dir=temp_base()) as td:
+            temp_dir = Path(td)
+            # Downloads are async; FFmpeg work is offloaded to threads inside the processor
+            output_path, duration = await process_longform_video(
+                job["audio_urls"],
+                job["background_source"],
+                job["background_urls"],
+                job["quality"],
+                temp_dir,
+            )
+            
+            # Upload result (blocking, run in thread pool)
+            loop = asyncio.get_event_loop()
+            result_url = await loop.run_in_executor(
+                None,
+                upload_merged_video,
+                output_path,
+                f"longform-{job_id[:12]}",
+            )
+            
+            processing_time = time.perf_counter() - start_time
+            
+            # Update job with result
+            await update_job_result(
+                job_id=job_id,
+                result_url=result_url,
+                duration_seconds=duration,
+                processing_time=processing_time,
+            )
+            completed = True
+            
+            logger.info(f"Job {job_id} completed successfully in {processing_time:.2f}s")
         
     except Exception as e:
+        if completed:
+            # Result is already stored; only the temp dir cleanup failed
+            logger.exception(f"Job {job_id} temp cleanup failed: {e}")
+            return
+        # Also covers temp dir creation (e.g. a missing TMP_DIR), so the job never
+        # stays 'processing'
         logger.exception(f"Job {job_id} failed: {e}")
         await update_job_status(
             job_id=job_id,
             status="failed",
             error_message=str(e)[:500],
         )
-    finally:
-        # Cleanup temp files
-        for f in (temp_dir.iterdir() if temp_dir.exists() else []):
-            try:
-                f.unlink()
-            except OSError:
-                pass
-        try:
-            temp_dir.rmdir()
-        except OSError:
-            pass
+
+
+def _on_job_done(task: asyncio.Task) -> None:
+    """Log anything process_job let escape (e.g. the failed-status update itself failing)."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Job task crashed", exc_info=task.exception())
 
 
 async def worker_loop():
-    """Main worker loop - polls for pending jobs and processes them."""
-    logger.info("Background worker started")
+    """
+    Main worker loop - claims pending jobs and runs up to MAX_CONCURRENT_JOBS at once,
+    idling until a new job is created or a running one finishes.
+    """
+    logger.info(f"Background worker started ({MAX_CONCURRENT_JOBS} concurrent jobs)")
+    running: Set[asyncio.Task] = set()
     
     while WORKER_ENABLED:
         try:
-            # Get pending jobs
-            jobs = await get_pending_jobs(limit=1)
+            # Claim only as many pending jobs as there are free slots
+            free_slots = MAX_CONCURRENT_JOBS - len(running)
+            jobs = await get_pending_jobs(limit=free_slots) if free_slots > 0 else []
+            for job in jobs:
+                task = asyncio.create_task(process_job(job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                task.add_done_callback(_on_job_done)
             
-            if jobs:
-                for job in jobs:
-                    await process_job(job)
-            else:
-                # No jobs, wait before polling again
-                await asyncio.sleep(WORKER_POLL_INTERVAL)
+            if len(running) >= MAX_CONCURRENT_JOBS:
+                # All slots busy: wait for one to free up
+                await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+            elif not jobs:
+                # Nothing pending: sleep until create_job signals one (or the failsafe timeout)
+                await wait_for_new_job(WORKER_IDLE_POLL_INTERVAL)
                 
         except Exception as e:
             logger.exception(f"Worker loop error: {e}")